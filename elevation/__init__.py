@@ -1,3 +1,4 @@
-from .core import time_smooth, distance_smooth
+from .core import (
+  time_smooth, time_smooth_batch, distance_smooth, smooth_and_stats)
 
 __version__ = '0.0.1'
\ No newline at end of file
